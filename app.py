@@ -15,26 +15,30 @@ import sys
 import re
 import csv
 import json
-import gzip
 import time
 import glob
 from pathlib import Path
 import argparse
 import urllib.parse
-import urllib.request
-from shapely.geometry import shape
-from shapely.ops import unary_union
-from SPARQLWrapper import SPARQLWrapper, JSON
+from http_client import HttpClient
+from normalize import normalize_row
+from nuts_index import NutsIndex, is_nuts_id
+from lau_store import load_lau, is_lau_id
+from vintages import LAUVintages, NUTSVintages, vintage_paths, LAU_YEARS, LAU_FILES, NUTS_YEARS, NUTS_FILES
+from memory import MemoryTracker, parse_size, plan, largest, lau_kind
+from gazetteer import Gazetteer, gazetteer_key, resolve
 
 # import spacy
 
-# Initialize the session
-S = requests.Session()
+# Initialize the HTTP client shared by all the remote lookups
+HTTP = HttpClient()
 
 # Wikidata query URL sparql
 WD_URL = 'https://query.wikidata.org/sparql?query='
 # Wikidata search api URL
 URL = "https://www.wikidata.org/w/api.php"
+# OSM SPARQL endpoint
+OSM_URL = "https://imagoarchive.it/fuseki/imago/query"
 # Value chain dataset
 CSV_DATASET = 'vc_1.csv'
 # LAU dataset
@@ -42,31 +46,24 @@ CSV_LAU = "eu_lau.csv"
 # GeoJSON with LAU and NUTS
 LAU = "geojson/LAU_RG_01M_2020_4326.geojson"
 NUTS = "geojson/NUTS_RG_20M_2021_4326.geojson"
+# TopoJSON with LAU, used instead of the GeoJSON when it exists
+LAU_TOPO = "topojson/LAU_RG_01M_2020_4326.json"
+# Year of the LAU and NUTS files, the other years are loaded
+# only when a code is not found in these ones
+LAU_YEAR = 2020
+NUTS_YEAR = 2021
+# With a memory budget the NUTS are dropped when
+# this number of rows in a row did not use them
+NUTS_IDLE_ROWS = 20
 
 
 
 # Function to load a URL and return the content of the page
 def loadURL(url, encoding='utf-8', asLines=False):
-    request = urllib.request.Request(url)
-
-    # Set headers
-    request.add_header('User-Agent', 'Mozilla/5.0 (Windows)')
-    request.add_header('Accept-Encoding', 'gzip')
-
-    # Try to open the URL
-    try:
-        myopener = urllib.request.build_opener()
-        f = myopener.open(request, timeout=120)
-        url = f.geturl()
-    except (urllib.error.URLError, urllib.error.HTTPError, ConnectionResetError):
-        raise
-    else:
-        # Handle gzipped pages
-        if f.info().get('Content-Encoding') == 'gzip':
-            f = gzip.GzipFile(fileobj=f)
-        # Return the content of the page
-        return f.readlines() if asLines else f.read().decode(encoding)
-    return None
+    # Gzipped pages are decoded by the client
+    f = HTTP.get(url)
+    # Return the content of the page
+    return f.content.splitlines(keepends=True) if asLines else f.content.decode(encoding)
 
 # Function to perform a Wikidata query
 # to retrieve the coords of a city
@@ -96,8 +93,6 @@ def wdQuery(qid):
 
 def osmQuery(qid):
     
-    # Set up the SPARQL endpoint URL
-    sparql = SPARQLWrapper("https://imagoarchive.it/fuseki/imago/query")
     # Set the SPARQL query string
     osm_query = f"""
     PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
@@ -113,12 +108,14 @@ def osmQuery(qid):
     }}
     """
     
-    # Set the query type to SELECT and the response format to JSON
-    sparql.setQuery(osm_query)
-    sparql.setReturnFormat(JSON)
-
-    # Execute the SPARQL query and retrieve the results
-    results = sparql.query().convert()
+    # Execute the SPARQL query and retrieve the results in JSON,
+    # if the endpoint is not available go on without the geometry
+    try:
+        results = HTTP.get(OSM_URL, params={'query': osm_query},
+                           headers={'Accept': 'application/sparql-results+json'}).json()
+    except requests.RequestException as e:
+        print(f'   OSM endpoint: {e}')
+        return None
 
     # Print the results
     for result in results["results"]["bindings"]:
@@ -246,7 +243,7 @@ def searchOnWikidata(place):
     }
 
     # Call the API
-    R = S.get(url=URL, params=PARAMS)
+    R = HTTP.get(URL, params=PARAMS)
     
     # Get the answer in JSON
     DATA = R.json()
@@ -287,32 +284,46 @@ def convertWKT(exp):
 def first_uppercase(a):
     return a.group(1) + a.group(2).upper()
 
-def ctr_code_from_vc_id(vc_id):
-    w = re.findall(r'(?<=_)\w\w\w?\d?\s*?$', vc_id)
-    if w[0][:2]=="GR":
-        return ["EL"]
-    elif w[0][:2]=="SE":
-        return ["RS"]
-    elif w[0]=="SCA":
-        return ["NO","FI"]
-    else:
-        return [w[0][:2]]
-
 
 # START the search -------------------------------
 parser = argparse.ArgumentParser()
 parser.add_argument('-n', '--nuts', action=argparse.BooleanOptionalAction, default=False)
+parser.add_argument('-l', '--lau', default=None, help='GeoJSON or TopoJSON file with the LAUs')
+parser.add_argument('-m', '--memory-budget', default=None, type=parse_size, help='Memory budget of the run (e.g. 2G)')
+parser.add_argument('-g', '--gazetteer', default=None, help='Gazetteer file, loaded if it exists and updated at the end of the run')
 # parser.add_argument('-b', '--bar-value', default=3.14)
 args = parser.parse_args()
+if args.lau and not os.path.exists(args.lau):
+    parser.error(f'LAU file not found: {args.lau}')
+if args.memory_budget is not None and args.memory_budget <= 0:
+    parser.error('the memory budget must be more than 0')
 print (args.nuts)
     
 print('=== LAU search ===\n')
        
-# LOAD the GeoJSON files
-with open(LAU) as f:
-    gj = json.load(f)
-with open(NUTS) as g:
-    nuts = json.load(g)
+# With a memory budget the run tracks the memory of every phase,
+# loads the cheapest LAU file that fits and frees what it can
+budget = args.memory_budget
+tracker = MemoryTracker(budget)
+# The load phase is not traced, tracemalloc would triple its memory
+tracker.start('load', trace=False)
+
+# LOAD the LAU file
+if budget:
+    lau_paths = [args.lau] if args.lau else [LAU_TOPO, LAU]
+    # The NUTS, one other LAU year and one other NUTS version
+    # can be loaded during the search, while it is traced
+    traced_paths = [(NUTS, 'GeoJSON')]
+    lau_vintage = largest(vintage_paths(LAU_YEARS, LAU_FILES, LAU_YEAR))
+    if lau_vintage:
+        traced_paths.append((lau_vintage, lau_kind(lau_vintage)))
+    nuts_vintage = largest(vintage_paths(NUTS_YEARS, NUTS_FILES, NUTS_YEAR))
+    if nuts_vintage:
+        traced_paths.append((nuts_vintage, 'GeoJSON'))
+    lau_path = plan(budget, lau_paths, [(CSV_LAU, 'CSV')], traced_paths)
+else:
+    lau_path = args.lau or (LAU_TOPO if os.path.exists(LAU_TOPO) else LAU)
+laus = load_lau(lau_path)
     
 # LOAD in a list the LAU dataset
 # Header of the csv
@@ -337,6 +348,34 @@ with open(CSV_LAU, encoding='utf-8') as g:
         
         # append the dict to the lau list
         lau_list.append(lau)
+
+# INDEX the NUTS hierarchy and the LAU list
+nuts_index = NutsIndex([], lau_list)
+
+# Function to load the NUTS in the index, with a memory
+# budget they are loaded only when a row needs them
+nuts_idle = 0
+def loadNUTS():
+    global nuts_idle
+    nuts_idle = 0
+    if not nuts_index.features:
+        with open(NUTS) as g:
+            nuts_index.add(json.load(g)['features'])
+
+if not budget:
+    loadNUTS()
+
+# The other GISCO years, loaded when needed, with a
+# memory budget only one other year is kept loaded
+lau_years = LAUVintages(LAU_YEAR, laus, keep=1 if budget else None)
+nuts_years = NUTSVintages(NUTS_YEAR, nuts_index, keep=1 if budget else None)
+
+# LOAD the gazetteer of the previous runs
+gazetteer = Gazetteer.load(args.gazetteer) if args.gazetteer else None
+if gazetteer is not None:
+    print(f'   Gazetteer: {len(gazetteer)} entries')
+
+tracker.end()
          
 
 # nlp =  spacy.load('en_core_web_trf')
@@ -352,9 +391,15 @@ count=0
 # Counter to count N/A values
 na=0
 
-# Read the VC dataset
-with open(CSV_DATASET, encoding='utf-8') as f:
+tracker.start('search')
+
+# Read the VC dataset and write every row with its LAU in the output
+with open(CSV_DATASET, encoding='utf-8') as f, open('output.csv', 'w', newline='') as write_obj:
     dataset = csv.reader(f, delimiter=',')
+    # Create a csv.writer object from the output file object
+    csv_writer = csv.writer(write_obj)
+    row0 = ["Member State","Card ID","Descriptor of the value chain","Reference mountain chain","Reference mountain landscape","LAU","CTR Code", "Effective LAU o NUTS","Centroid","Shape"]
+    csv_writer.writerow(row0)
 
     # For each row of the TSV...
     for i, row in enumerate(dataset):
@@ -373,8 +418,6 @@ with open(CSV_DATASET, encoding='utf-8') as f:
         # The Value Chain lau code value
         vc_lau_code = row[5]
         
-        ctr_code = ctr_code_from_vc_id(vc_id)
-        
         # Declare found variable that will be set
         # True when a place will be found
         found=False
@@ -390,69 +433,26 @@ with open(CSV_DATASET, encoding='utf-8') as f:
             na=na+1
             pass
 
-                
-        # Some regex to clean mountain landscape value
-        m_l=re.sub(r'\s(\(.*)', '', mountain_landscape) # Clen value in brackets
-        m_l=re.sub(r'LAU\s?1\s', '', m_l) # Clean the words 'LAU' or 'LAU1'
-        m_l=m_l.strip()
-        
-        # Some regex to clean VC_lau_code
-        VC_l_c=re.sub(r'LAU\s?1\s?', '', vc_lau_code)  # Clean the words 'LAU' or 'LAU1'
-        VC_l_c=re.sub(r'TR\d\d\d-', '', VC_l_c)  # Clean the prefix 'TR000'
-        VC_l_c=re.sub(r'NUTS\s?3\s', '', VC_l_c) # Clean the words 'NUTS 3' or 'NUTS3'
-           
-        # print(VC_l_c)
-        VC_l_c=re.sub(r'(?<=\d{5})\s.*$', '', VC_l_c) 
-        # print(VC_l_c)
-        
-        if "LAU 1 not used" in vc_lau_code:
-            try:
-                start_index = vc_lau_code.index("„") + 1
-                end_index = vc_lau_code.index("“", start_index)
-                value = vc_lau_code[start_index:end_index]
-                m_l = m_l + " " + value
-                print(m_l)
-            except:
-                m_l = m_l
-        
-        # Uniformate multiple lau code in a list
-        re_multiple="\d* and \d*"
-        regex_multiple=re.compile(re_multiple)
-        if re.match(regex_multiple, VC_l_c):
-            find = re.findall(r'\d\d+', VC_l_c)
-            f_lau=""
-            for i in find:
-                f_lau=f_lau+i+";"
-            VC_l_c=f_lau
-            
-                
-         
-        # Corsica is an italian word, Translate the word in French
-        if(m_l=="Corsica"):
-            m_l="Corse"
-            
-        # Fix LAU code of some nation
-        if 'IT' in ctr_code:
-            if len(VC_l_c)==4:
-                VC_l_c = '00'+VC_l_c
-            if len(VC_l_c)==5:
-                VC_l_c = '0'+VC_l_c
-        elif 'PT' in ctr_code:
-            VC_l_c = '0'+VC_l_c
-        
-        # if(row[0]=="PORTUGAL_ESTRELA"):
-        #     l = "0"+l 
-        
-        # Uniformate Places in First capital letter format
-        # if(m_l.isupper()):
-        #     s1 = m_l.lower()
-        #     s2 = re.sub("(^|\s)(\S)", first_uppercase, s1)
-        #     m_l=s2
-        
-        m_l=m_l.lower()
-            
+        # Clean mountain landscape and VC_lau_code values
+        # and get the country codes from the value chain id
+        m_l, VC_l_c, ctr_code = normalize_row(mountain_landscape, vc_lau_code, vc_id)
+
+        # Strategy that found the place and GISCO year of its codes
+        strategy = None
+        year = None
+
+        # Search the values in the gazetteer first
+        if gazetteer is not None:
+            key = gazetteer_key(m_l, VC_l_c, ctr_code)
+            entry = gazetteer.get(key)
+            if entry:
+                result = resolve(entry, lau_years, nuts_years, loadNUTS, convertWKT)
+                if result:
+                    story[vc_id] = result
+                    gazetteer.hits = gazetteer.hits + 1
+                    found=True
             
-        if "CH" in ctr_code:
+        if "CH" in ctr_code and not found:
             # print(m_l)
             if m_l!="n/a":
                 # print(m_l)
@@ -467,21 +467,20 @@ with open(CSV_DATASET, encoding='utf-8') as f:
                 # print(multiple_lau)
                 for item in multiple_lau:
                     item = item.strip()
-                    for feature in gj['features']:
-                        if(feature['properties']['LAU_ID']==item):
-                            # print(feature['properties']['LAU_ID'])
-                            gg = shape(feature['geometry'])
-                            m_shapes.append(gg)
-                            n_lau = n_lau + feature['properties']['LAU_ID'] + ";"
-                            # story[vc_id] = [gg.centroid, gg]
-                            ct_codes=ct_codes+feature['properties']['CNTR_CODE'] +";"
+                    for k, props in enumerate(laus.properties):
+                        if(props['LAU_ID']==item):
+                            # print(props['LAU_ID'])
+                            m_shapes.append(k)
+                            n_lau = n_lau + props['LAU_ID'] + ";"
+                            ct_codes=ct_codes+props['CNTR_CODE'] +";"
                             multi=True
                 if multi:
-                    union = unary_union(m_shapes)
+                    union = laus.union(m_shapes)
                     story[vc_id] = [ct_codes,n_lau,union.centroid, union]
+                    strategy, year = 'lau_multi', LAU_YEAR
                     found=True
             
-        if len(VC_l_c.split(";")) > 1:
+        if len(VC_l_c.split(";")) > 1 and not found:
             # print(VC_l_c)
             m_shapes=[]
             n_lau=""
@@ -491,16 +490,15 @@ with open(CSV_DATASET, encoding='utf-8') as f:
             # print(multiple_lau)
             for item in multiple_lau:
                 item = item.strip()
-                for feature in gj['features']:
-                    if(feature['properties']['LAU_ID']==item):
-                        # print(feature['properties']['LAU_ID'])
-                        gg = shape(feature['geometry'])
-                        m_shapes.append(gg)
-                        n_lau = n_lau + feature['properties']['LAU_ID'] + ";"
-                        # story[vc_id] = [gg.centroid, gg]
-                        ct_codes=ct_codes+feature['properties']['CNTR_CODE'] +";"
-            union = unary_union(m_shapes)
+                for k, props in enumerate(laus.properties):
+                    if(props['LAU_ID']==item):
+                        # print(props['LAU_ID'])
+                        m_shapes.append(k)
+                        n_lau = n_lau + props['LAU_ID'] + ";"
+                        ct_codes=ct_codes+props['CNTR_CODE'] +";"
+            union = laus.union(m_shapes)
             story[vc_id] = [ct_codes,n_lau,union.centroid, union]
+            strategy, year = 'lau_multi', LAU_YEAR
             found=True
             
         shapes = []
@@ -509,88 +507,61 @@ with open(CSV_DATASET, encoding='utf-8') as f:
         nuts_3= ""
         vc_lau_code_found = ""
         found_lau = False
-        for lau_dict in lau_list:
-            if not found:
-                m_l = m_l.strip()
-                if(m_l==lau_dict['name'].lower() or m_l==lau_dict['nameLat'].lower()):
-                    # print("Found!" + row[17] + " - " + feature['properties']['LAU_NAME'])
-                    # print(lau_dict['nuts3'][:2])
-                    if lau_dict['nuts3'][:2] in ctr_code:
-                        vc_lau_code_found = lau_dict['lauCode']
-                        nuts_3=lau_dict['nuts3']
-                        # story[vc_id] = [feature['properties']['CNTR_CODE'],feature['properties']['LAU_ID'],gg.centroid, gg]
-                        found_lau=True
-                        break
-                # regex = re.compile(m_l, re.I)
-                # if re.match(regex, lau_dict['name']):
-                #     # print(lau_dict['nuts3'][:2])
-                #     if lau_dict['nuts3'][:2] in ctr_code:
-                #         # print("Found!" + row[17] + " - " + feature['properties']['LAU_NAME'])
-                #         vc_lau_code_found = lau_dict['lauCode']
-                #         # story[vc_id] = [feature['properties']['CNTR_CODE'],feature['properties']['LAU_ID'],gg.centroid, gg]
-                #         nuts_3=lau_dict['nuts3']
-                #         found_lau=True
-                #         break
-                # if re.match(regex, lau_dict['nameLat']):
-                #     if lau_dict['nuts3'][:2] in ctr_code:
-                #         # print("Found!" + row[17] + " - " + feature['properties']['LAU_NAME'])
-                #         vc_lau_code_found = lau_dict['lauCode']
-                #         # story[vc_id] = [feature['properties']['CNTR_CODE'],feature['properties']['LAU_ID'],gg.centroid, gg]
-                #         nuts_3=lau_dict['nuts3']
-                #         found_lau=True
-                #         break
-        for feature in gj['features']:
-            if not found:
-                if not found_lau:
-                    m_l = m_l.rstrip()
-                    if(m_l==feature['properties']['LAU_NAME'].lower()):
-                        # print("Found!" + row[17] + " - " + feature['properties']['LAU_NAME'])
-                        if feature['properties']['CNTR_CODE'] in ctr_code:
-                            gg = shape(feature['geometry'])
-                            story[vc_id] = [feature['properties']['CNTR_CODE'],feature['properties']['LAU_ID'],gg.centroid, gg]
-                            found=True
-                            break
-            if not found:
-                if not found_lau:
-                    VC_l_c = VC_l_c.rstrip()
-                    if(feature['properties']['LAU_ID']==VC_l_c):
-                        # print(feature['properties']['LAU_ID'])
-                        if feature['properties']['CNTR_CODE'] in ctr_code:
-                            found=True
-                            gg = shape(feature['geometry'])
-                            story[vc_id] = [feature['properties']['CNTR_CODE'],feature['properties']['LAU_ID'],gg.centroid, gg]
-                            break
-                if found_lau:
-                    # if feature['properties']['LAU_ID']==vc_lau_code:
-                    #     # print(feature['properties']['LAU_ID'])
-                    #     if ctr_code == feature['properties']['CNTR_CODE']:
-                    #         print(ctr_code +" - " + feature['properties']['CNTR_CODE'])
-                    #         found=True
-                    #         gg = shape(feature['geometry'])
-                    #         story[vc_id] = [feature['properties']['CNTR_CODE'],feature['properties']['LAU_ID'],gg.centroid, gg]
-                    #         break
-                    if feature['properties']['LAU_ID']==vc_lau_code_found:
-                        if feature['properties']['CNTR_CODE'] in ctr_code:
-                            found=True
-                            gg = shape(feature['geometry'])
-                            story[vc_id] = [feature['properties']['CNTR_CODE'],feature['properties']['LAU_ID'],gg.centroid, gg]
-                            break
+        if not found:
+            m_l = m_l.strip()
+            # Search the name in the LAU list through the NUTS index
+            lau_dict = nuts_index.find_lau(m_l, ctr_code)
+            if lau_dict:
+                vc_lau_code_found = lau_dict['lauCode']
+                nuts_3=lau_dict['nuts3']
+                found_lau=True
+            # Scan the LAUs by name and code, skipped when the gazetteer
+            # or the searches above already found the place
+            for k, props in enumerate(laus.properties):
+                if not found:
+                    if not found_lau:
+                        m_l = m_l.rstrip()
+                        if(m_l==props['LAU_NAME'].lower()):
+                            # print("Found!" + row[17] + " - " + props['LAU_NAME'])
+                            if props['CNTR_CODE'] in ctr_code:
+                                gg = laus.shape(k)
+                                story[vc_id] = [props['CNTR_CODE'],props['LAU_ID'],gg.centroid, gg]
+                                strategy, year = 'lau_name', LAU_YEAR
+                                found=True
+                                break
+                if not found:
+                    if not found_lau:
+                        VC_l_c = VC_l_c.rstrip()
+                        if(props['LAU_ID']==VC_l_c):
+                            # print(props['LAU_ID'])
+                            if props['CNTR_CODE'] in ctr_code:
+                                found=True
+                                gg = laus.shape(k)
+                                story[vc_id] = [props['CNTR_CODE'],props['LAU_ID'],gg.centroid, gg]
+                                strategy, year = 'lau_code', LAU_YEAR
+                                break
+                    if found_lau:
+                        if props['LAU_ID']==vc_lau_code_found:
+                            if props['CNTR_CODE'] in ctr_code:
+                                found=True
+                                gg = laus.shape(k)
+                                story[vc_id] = [props['CNTR_CODE'],props['LAU_ID'],gg.centroid, gg]
+                                strategy, year = 'lau_list', LAU_YEAR
+                                break
          
             
         if not found:
             # print(m_l)
-            for feature in gj['features']:
-                reg="^"+VC_l_c
-                regex = re.compile(reg)
-                if(re.match(regex, feature['properties']['LAU_ID'])):
-                    if feature['properties']['CNTR_CODE'] in ctr_code:
-                        gg = shape(feature['geometry'])
-                        shapes.append(gg)
-                        n_lau = n_lau + feature['properties']['LAU_ID'] + ";"
-                        # story[vc_id] = [gg.centroid, gg]
+            reg="^"+VC_l_c
+            regex = re.compile(reg)
+            for k, props in enumerate(laus.properties):
+                if(re.match(regex, props['LAU_ID'])):
+                    if props['CNTR_CODE'] in ctr_code:
+                        shapes.append(k)
+                        n_lau = n_lau + props['LAU_ID'] + ";"
                         found=True
                         multi = True
-                        ct_codes=ct_codes+feature['properties']['CNTR_CODE'] +";"
+                        ct_codes=ct_codes+props['CNTR_CODE'] +";"
                     
                 # print(l)
                 # for name in laus.keys():
@@ -605,8 +576,23 @@ with open(CSV_DATASET, encoding='utf-8') as f:
             #             found=True
             #             break
             if multi:
-                un = unary_union(shapes)
+                un = laus.union(shapes)
                 story[vc_id] = [ct_codes,n_lau, un.centroid, un]
+                strategy, year = 'lau_prefix', LAU_YEAR
+        if not found:
+            # Search the LAU code in the other years, the NUTS
+            # are loaded to tell the NUTS codes from the LAU codes
+            loadNUTS()
+            hit = lau_years.find(ctr_code, VC_l_c) if is_lau_id(VC_l_c, ctr_code, nuts_index.features) else None
+            if hit:
+                year, store, k = hit
+                props = store.properties[k]
+                gg = store.shape(k)
+                story[vc_id] = [props['CNTR_CODE'],props['LAU_ID'],gg.centroid, gg]
+                strategy = 'lau_year'
+                found=True
+                # Do not keep the year loaded when it is dropped
+                hit = store = None
         if not found:
             # print(m_l)
             m = re.findall(r'[aA][tT]\s\d{2}', m_l)
@@ -614,25 +600,24 @@ with open(CSV_DATASET, encoding='utf-8') as f:
                 n = re.sub(r'\s', '', m[0])
                 n = n.upper()
                 VC_l_c = n
-            for n_feature in nuts['features']:
-                if(n_feature['properties']['NUTS_ID']==VC_l_c):
-                    gg = shape(n_feature['geometry'])
-                    story[vc_id] = [n_feature['properties']['CNTR_CODE'],n_feature['properties']['NUTS_ID'], gg.centroid, gg]
+            # Search the NUTS by code or by name
+            loadNUTS()
+            nuts_id = nuts_index.find(VC_l_c, m_l)
+            if nuts_id:
+                gg = nuts_index.shape(nuts_id)
+                story[vc_id] = [nuts_index.country(nuts_id), nuts_id, gg.centroid, gg]
+                strategy, year = 'nuts', NUTS_YEAR
+                found=True
+            # Search the NUTS code of the country in the other versions
+            elif is_nuts_id(VC_l_c) and VC_l_c[:2] in ctr_code:
+                hit = nuts_years.find(VC_l_c)
+                if hit:
+                    year, index = hit
+                    gg = index.shape(VC_l_c)
+                    story[vc_id] = [index.country(VC_l_c), VC_l_c, gg.centroid, gg]
+                    strategy = 'nuts_year'
                     found=True
-                    break
-                
-                try:
-                    if(m_l==n_feature['properties']['NAME_LATIN'].lower()):
-                        gg = shape(n_feature['geometry'])
-                        story[vc_id] = [n_feature['properties']['CNTR_CODE'],n_feature['properties']['NUTS_ID'], gg.centroid, gg]
-                        found=True
-                        break
-                except:
-                    if(m_l==n_feature['properties']['NUTS_NAME'].lower()):
-                        gg = shape(n_feature['geometry'])
-                        story[vc_id] = [n_feature['properties']['CNTR_CODE'],n_feature['properties']['NUTS_ID'], gg.centroid, gg]
-                        found=True
-                        break
+                    hit = index = None
         
         if not found:
             # print("-------------" + m_l)
@@ -641,6 +626,7 @@ with open(CSV_DATASET, encoding='utf-8') as f:
                     b, coord = searchOnWikidata(m_l)
                     if(b):
                         story[vc_id] = ["","", convertWKT(coord), coord]
+                        strategy, year = 'wikidata', None
                         found=True
                 except:
                     print(m_l)
@@ -648,12 +634,12 @@ with open(CSV_DATASET, encoding='utf-8') as f:
         if not found:
             # print(nuts_3)  
             if nuts_3!="":
-                for n_feature in nuts['features']:
-                    if(n_feature['properties']['NUTS_ID']==nuts_3):
-                        gg = shape(n_feature['geometry'])
-                        story[vc_id] = [n_feature['properties']['CNTR_CODE'],n_feature['properties']['NUTS_ID'], gg.centroid, gg]
-                        found=True
-                        break
+                loadNUTS()
+            if nuts_index.feature(nuts_3):
+                gg = nuts_index.shape(nuts_3)
+                story[vc_id] = [nuts_index.country(nuts_3), nuts_3, gg.centroid, gg]
+                strategy, year = 'nuts3', NUTS_YEAR
+                found=True
                     
         if(found):
             count=count+1
@@ -661,33 +647,41 @@ with open(CSV_DATASET, encoding='utf-8') as f:
             if(m_l!="n/a"):
                 print(m_l + " - " + VC_l_c)
 
+        # Add what was found to the gazetteer
+        if gazetteer is not None and strategy:
+            gazetteer.add(key, story[vc_id][0], story[vc_id][1], strategy, year, story[vc_id][3])
+
+        # Write the row with the CTR code, the LAU or NUTS code,
+        # the centroid and the shape found for the value chain
+        if vc_id in story:
+            row.extend(story[vc_id])
+        csv_writer.writerow(row)
+
+        # With a memory budget drop the geometries once written
+        if budget:
+            story.pop(vc_id, None)
+            laus.clear()
+            nuts_index.clear()
+            # and the NUTS when they are no longer used
+            nuts_idle += 1
+            if nuts_idle > NUTS_IDLE_ROWS and nuts_index.features:
+                nuts_index.unload()
+                nuts_years.unload()
+            tracker.check()
+
+tracker.end()
+
 # print(story)
 print("Found: " + str(count))
 print("Not found: " + str(455-count-na))
 print("N/A: " + str(na))
+tracker.report()
 
+# EXPORT the gazetteer for the next runs
+if gazetteer is not None:
+    gazetteer.save(args.gazetteer)
+    print(f'Gazetteer: {gazetteer.hits} rows found in it, {len(gazetteer)} entries saved in {args.gazetteer}')
 
-with open(CSV_DATASET, 'r') as read_obj, open('output.csv', 'w', newline='') as write_obj:
-    # Create a csv.reader object from the input file object
-    csv_reader = csv.reader(read_obj)
-    # Create a csv.writer object from the output file object
-    csv_writer = csv.writer(write_obj)
-    # Read each row of the input csv file as list
-    row0 = ["Member State","Card ID","Descriptor of the value chain","Reference mountain chain","Reference mountain landscape","LAU","CTR Code", "Effective LAU o NUTS","Centroid","Shape"]
-    csv_writer.writerow(row0)
-    for row in csv_reader:
-        # Pass the list / row in the transform function to add column text for this row
-        try:            
-            row.append(story[row[1]][0])
-            row.append(story[row[1]][1])
-            row.append(story[row[1]][2])
-            row.append(story[row[1]][3])
-        except:
-            pass
-        # transform_row(row, csv_reader.line_num)
-        # Write the updated row / list to the output file
-        csv_writer.writerow(row)
-        
 
 # doc = nlp(text)
 # print("Noun phrases:", [chunk.text for chunk in doc.noun_chunks])
@@ -0,0 +1 @@
+# Makes the modules next to app.py importable from the tests
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    gazetteer.py
+
+    Gazetteer
+    Lookup table from the normalized input values of a row to the LAU
+    or NUTS found for it, exported at the end of a run and loaded by
+    the next runs (also on other datasets) as the first search, before
+    the LAU files, the NUTS and the remote lookups.
+
+    The file is a JSON object:
+    {"version": 1, "entries": {key: [CNTR_CODE, LAU_ID or NUTS_ID, strategy, year, geometry]}}
+    where the key is 'country codes|mountain landscape|lau code' as
+    returned by normalize_row, the codes are ';' separated when the
+    place is the union of several LAUs, the year is the GISCO year of
+    the codes and the geometry is only kept for the remote lookups,
+    which have no code. An entry is rebuilt from the GISCO files of
+    its year.
+"""
+
+import os
+import json
+
+VERSION = 1
+
+# Strategies of the entries
+LAU_STRATEGIES = ('lau_name', 'lau_code', 'lau_list', 'lau_year')
+LAU_UNION_STRATEGIES = ('lau_multi', 'lau_prefix')
+NUTS_STRATEGIES = ('nuts', 'nuts_year', 'nuts3')
+REMOTE_STRATEGIES = ('wikidata',)
+
+
+# Function to get the key of a row from its normalized values
+def gazetteer_key(m_l, VC_l_c, ctr_code):
+    return "|".join((";".join(ctr_code), m_l.strip(), VC_l_c.strip()))
+
+# Function to split the ';' separated codes of an entry
+def split_codes(codes):
+    return [code for code in codes.split(";") if code != ""]
+
+
+# Function to rebuild the result of a row from an entry, from the LAU
+# and NUTS vintages, it returns None if the codes are not in the GISCO
+# files. load_nuts loads the NUTS of the primary version when they are
+# loaded on demand, convert_wkt gets the centroid of a remote geometry
+def resolve(entry, lau_years, nuts_years, load_nuts=None, convert_wkt=None):
+    cntr_code, code, strategy, year = entry[:4]
+    if strategy in REMOTE_STRATEGIES:
+        coord = entry[4]
+        return ["", "", convert_wkt(coord), coord]
+    if strategy in NUTS_STRATEGIES:
+        if load_nuts:
+            load_nuts()
+        index = nuts_years.get(year)
+        if index is None or not index.feature(code):
+            return None
+        gg = index.shape(code)
+        return [cntr_code, code, gg.centroid, gg]
+    store = lau_years.get(year)
+    if store is None:
+        return None
+    found_k = [store.find((c,), l) for c, l in zip(split_codes(cntr_code), split_codes(code))]
+    if None in found_k:
+        return None
+    if strategy in LAU_UNION_STRATEGIES:
+        gg = store.union(found_k)
+    elif found_k:
+        gg = store.shape(found_k[0])
+    else:
+        return None
+    return [cntr_code, code, gg.centroid, gg]
+
+
+class Gazetteer:
+
+    def __init__(self, entries=None):
+        self.entries = entries if entries is not None else {}
+        # Number of rows found in the gazetteer
+        self.hits = 0
+
+    # Function to load a gazetteer, an empty one if the
+    # file does not exist or has another version
+    @classmethod
+    def load(cls, path):
+        if not path or not os.path.exists(path):
+            return cls()
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != VERSION:
+            print(f'   Gazetteer {path} has version {data.get("version")}, expected {VERSION}: not used')
+            return cls()
+        return cls(data['entries'])
+
+    # Function to export the gazetteer
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'version': VERSION, 'entries': self.entries}, f,
+                      ensure_ascii=False, separators=(',', ':'))
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    # Function to add what was found for a row, a search that
+    # gave no code (e.g. an empty union of LAUs) is not kept
+    def add(self, key, cntr_code, code, strategy, year=None, geometry=None):
+        if not code and strategy not in REMOTE_STRATEGIES:
+            return
+        entry = [cntr_code, code, strategy, year]
+        if strategy in REMOTE_STRATEGIES:
+            entry.append(geometry)
+        self.entries[key] = entry
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    http_client.py
+
+    HTTP client
+    One session shared by all the remote lookups (Wikidata API,
+    Wikidata SPARQL endpoint, OSM SPARQL endpoint) with pooled
+    keep-alive connections, gzip, short timeouts per endpoint,
+    retries with jitter and a circuit breaker per endpoint.
+
+    When an endpoint keeps failing the breaker opens and the next
+    calls to it fail at once with CircuitOpenError, until the
+    cooldown is over and one call is let through to try it again.
+"""
+
+import time
+import random
+import requests
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+
+# (connect, read) timeouts in seconds per endpoint host
+TIMEOUTS = {
+    "query.wikidata.org": (3.05, 30),
+    "www.wikidata.org": (3.05, 10),
+    "imagoarchive.it": (3.05, 15),
+}
+DEFAULT_TIMEOUT = (3.05, 20)
+# HTTP status codes worth a retry
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    pass
+
+
+class Breaker:
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+
+    # Function to check if a call can be made
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        # After the cooldown one call is let through (half open)
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class HttpClient:
+
+    def __init__(self, timeouts=TIMEOUTS, retries=2, backoff=0.5, threshold=3, cooldown=300, pool_size=10):
+        self.timeouts = dict(timeouts)
+        self.retries = retries
+        self.backoff = backoff
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.breakers = {}
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows)',
+            'Accept-Encoding': 'gzip',
+        })
+
+    # Function to get the breaker of an endpoint
+    def breaker(self, host):
+        if host not in self.breakers:
+            self.breakers[host] = Breaker(self.threshold, self.cooldown)
+        return self.breakers[host]
+
+    # Function to make a GET request, it returns the response or raises
+    # a requests exception when all the attempts failed
+    def get(self, url, params=None, headers=None):
+        host = urlsplit(url).netloc
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            raise CircuitOpenError(f'{host} is not available')
+
+        timeout = self.timeouts.get(host, DEFAULT_TIMEOUT)
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    breaker.success()
+                    return response
+                error = requests.HTTPError(f'{response.status_code} for {response.url}', response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except requests.HTTPError:
+                # Client errors are not a problem of the endpoint
+                breaker.success()
+                raise
+            if attempt < self.retries:
+                # Exponential backoff with jitter
+                time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+        breaker.failure()
+        raise error
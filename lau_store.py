@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    lau_store.py
+
+    LAU geometries
+    Load the GISCO LAUs from a GeoJSON or a TopoJSON file.
+    Both stores expose the properties of the LAUs as a list and build
+    the shape of a LAU, or the union of several LAUs, from its
+    position in that list.
+
+    In the TopoJSON file the shared borders are stored once as arcs:
+    the arcs are decoded only for the LAUs that are matched, and the
+    union of adjacent LAUs is made by dropping the arcs they share
+    instead of running a general polygon union.
+"""
+
+import re
+import json
+from collections import defaultdict
+from shapely.geometry import shape, Polygon, MultiPolygon
+from shapely.ops import unary_union
+from nuts_index import is_nuts_id
+
+# A code of the former NUTS 4 (LAU 1) level, e.g. CZ0322
+RE_LAU1_ID = re.compile(r'[A-Z]{2}\d{4}')
+
+
+# Function to check if a value can be a LAU code: not empty, without
+# spaces, '/' (e.g. 'N/A') or ';' and not a NUTS or LAU 1 code.
+# Many LAU codes look like NUTS codes (e.g. the Bulgarian GAB05 or
+# BGS13), so a value is a NUTS code only if it is one of the known
+# NUTS codes or, when they are not known, if it starts with the
+# country code of the row
+def is_lau_id(value, ctr_code=(), nuts_ids=None):
+    if not value or re.search(r'[\s/;]', value):
+        return False
+    if RE_LAU1_ID.fullmatch(value):
+        return False
+    if nuts_ids is not None:
+        return value not in nuts_ids
+    return not (is_nuts_id(value) and value[:2] in ctr_code)
+
+
+class LAUStore:
+
+    properties = []
+    # LAU_ID -> positions of the LAUs, built at the first search
+    _ids = None
+
+    # Function to search a LAU code in one of the countries,
+    # it returns the position of the first LAU found or None
+    def find(self, ctr_code, lau_id):
+        if self._ids is None:
+            self._ids = defaultdict(list)
+            for k, props in enumerate(self.properties):
+                self._ids[props['LAU_ID']].append(k)
+        for k in self._ids.get(lau_id, []):
+            if self.properties[k]['CNTR_CODE'] in ctr_code:
+                return k
+        return None
+
+    # Function to drop the geometries decoded so far
+    def clear(self):
+        pass
+
+
+class GeoJSONLAU(LAUStore):
+
+    def __init__(self, path):
+        with open(path) as f:
+            gj = json.load(f)
+        self.properties = [feature['properties'] for feature in gj['features']]
+        self.geometries = [feature['geometry'] for feature in gj['features']]
+
+    # Function to get the shape of a LAU
+    def shape(self, i):
+        return shape(self.geometries[i])
+
+    # Function to get the union of several LAUs
+    def union(self, indices):
+        return unary_union([self.shape(i) for i in indices])
+
+
+class TopoJSONLAU(LAUStore):
+
+    def __init__(self, path, name=None):
+        with open(path) as f:
+            topology = json.load(f)
+        # Use the named object or the first one of the topology
+        objects = topology['objects']
+        collection = objects[name] if name else next(iter(objects.values()))
+        geometries = collection['geometries']
+
+        self.properties = [geometry.get('properties', {}) for geometry in geometries]
+        # Arc indices of every LAU as a list of polygons of rings
+        self.polygons = [self._polygons(geometry) for geometry in geometries]
+        self.arcs = topology['arcs']
+        self.transform = topology.get('transform')
+        # Decoded arcs, filled when a LAU is matched
+        self._decoded = {}
+
+    # Function to get the rings of arcs of a geometry as a list of polygons
+    @staticmethod
+    def _polygons(geometry):
+        if geometry.get('type') == 'Polygon':
+            return [geometry['arcs']]
+        if geometry.get('type') == 'MultiPolygon':
+            return geometry['arcs']
+        return []
+
+    # Function to decode an arc in a list of coordinates,
+    # quantized arcs are delta-encoded
+    def _arc(self, a):
+        if a not in self._decoded:
+            arc = self.arcs[a]
+            if self.transform:
+                (sx, sy), (tx, ty) = self.transform['scale'], self.transform['translate']
+                x = y = 0
+                points = []
+                for dx, dy in arc:
+                    x += dx
+                    y += dy
+                    points.append((x * sx + tx, y * sy + ty))
+            else:
+                points = [tuple(p[:2]) for p in arc]
+            self._decoded[a] = points
+        return self._decoded[a]
+
+    # Function to get the coordinates of an arc reference,
+    # a negative reference ~a is the arc a reversed
+    def _ref(self, ref):
+        if ref < 0:
+            return self._arc(~ref)[::-1]
+        return self._arc(ref)
+
+    # Function to join the arcs of a ring
+    def _ring(self, refs):
+        ring = []
+        for ref in refs:
+            points = self._ref(ref)
+            ring.extend(points[1:] if ring else points)
+        return ring
+
+    def clear(self):
+        self._decoded.clear()
+
+    # Function to get the shape of a LAU
+    def shape(self, i):
+        polygons = [[self._ring(refs) for refs in rings] for rings in self.polygons[i]]
+        polygons = [Polygon(rings[0], rings[1:]) for rings in polygons if rings]
+        if len(polygons) == 1:
+            return polygons[0]
+        return MultiPolygon(polygons)
+
+    # Function to get the union of several LAUs, the arcs shared by
+    # two of the LAUs are inside the union and are dropped, the others
+    # are joined in rings
+    def union(self, indices):
+        indices = list(dict.fromkeys(indices))
+        if not indices:
+            return unary_union([])
+        refs = [ref for i in indices for rings in self.polygons[i] for refs in rings for ref in refs]
+        used = defaultdict(int)
+        for ref in refs:
+            used[ref if ref >= 0 else ~ref] += 1
+        border = [ref for ref in refs if used[ref if ref >= 0 else ~ref] == 1]
+
+        rings = self._stitch(border)
+        if rings is None:
+            return unary_union([self.shape(i) for i in indices])
+        union = self._assemble(rings)
+        if not union.is_valid:
+            return unary_union([self.shape(i) for i in indices])
+        return union
+
+    # Function to join the border arcs in closed rings,
+    # it returns None if an arc cannot be closed
+    def _stitch(self, refs):
+        starts = defaultdict(list)
+        for ref in refs:
+            starts[self._ref(ref)[0]].append(ref)
+
+        rings = []
+        for ref in refs:
+            start = self._ref(ref)[0]
+            if ref not in starts[start]:
+                continue
+            starts[start].remove(ref)
+            ring = list(self._ref(ref))
+            while ring[-1] != ring[0]:
+                if not starts[ring[-1]]:
+                    return None
+                ring.extend(self._ref(starts[ring[-1]].pop())[1:])
+            rings.append(ring)
+        return rings
+
+    # Function to build the polygons from the rings, a ring inside
+    # an odd number of rings is a hole of the smallest of them
+    @staticmethod
+    def _assemble(rings):
+        rings = sorted((Polygon(ring) for ring in rings if len(ring) > 3), key=lambda p: p.area, reverse=True)
+        shells = {}
+        for k, ring in enumerate(rings):
+            point = ring.representative_point()
+            parents = [j for j in range(k) if rings[j].contains(point)]
+            if len(parents) % 2 == 1 and parents[-1] in shells:
+                shells[parents[-1]].append(ring.exterior.coords)
+            else:
+                shells[k] = []
+        polygons = [Polygon(rings[k].exterior.coords, holes) for k, holes in shells.items()]
+        if len(polygons) == 1:
+            return polygons[0]
+        return MultiPolygon(polygons)
+
+
+# Function to load the LAUs from a GeoJSON or a TopoJSON file
+def load_lau(path):
+    with open(path) as f:
+        head = f.read(4096)
+    if '"Topology"' in head:
+        return TopoJSONLAU(path)
+    return GeoJSONLAU(path)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    memory.py
+
+    Memory budget
+    Estimate the memory needed to load the input files, pick the
+    cheapest way to load them and track the peak RSS and the top
+    allocations (tracemalloc) of every phase of the run.
+
+    The estimates are rough: the memory of a parsed file is taken as
+    its size on disk multiplied by a factor measured on the GISCO files.
+    tracemalloc keeps a trace of every allocation, which takes about
+    three times the memory of a parsed file, so it is not started
+    before the input files are loaded: that phase only reports its
+    peak RSS, and the files loaded later (e.g. the NUTS, when a row
+    needs them) are estimated with the overhead of the traces.
+"""
+
+import os
+import re
+import sys
+import resource
+import tracemalloc
+
+# Ratio between the memory of a parsed file and its size on disk
+LOAD_FACTORS = {
+    'GeoJSON': 4,
+    'TopoJSON': 6,
+    'CSV': 5,
+}
+# Memory of the traces of a file parsed while tracemalloc runs,
+# added to its load factor
+TRACE_FACTOR = 10
+# Memory of the interpreter with shapely and requests imported
+BASE_MEMORY = 50 * 2**20
+# Number of allocation sites printed for every phase
+TOP_ALLOCATIONS = 5
+
+UNITS = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+
+
+# Run stops with this error when the budget cannot be met,
+# as a SystemExit it is printed without a traceback
+class MemoryBudgetError(SystemExit):
+    pass
+
+
+# Function to parse a size as 512M, 2G or 1.5GB
+def parse_size(value):
+    m = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*', value, re.I)
+    if not m:
+        raise ValueError(f'invalid size: {value}')
+    return int(float(m.group(1)) * UNITS[m.group(2).upper()])
+
+# Function to format a size in MB
+def format_size(size):
+    return f'{size / 2**20:.0f} MB'
+
+# Function to get the peak RSS of the process in bytes
+def peak_rss():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux gives kilobytes, macOS bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+# Function to estimate the memory of a parsed file
+def estimate(path, kind, traced=False):
+    if not path or not os.path.exists(path):
+        return 0
+    return os.path.getsize(path) * (LOAD_FACTORS[kind] + (TRACE_FACTOR if traced else 0))
+
+# Function to get the largest of some files, None if there is none
+def largest(paths):
+    return max(paths, key=os.path.getsize, default=None)
+
+# Function to get the kind of a LAU file
+def lau_kind(path):
+    with open(path) as f:
+        return 'TopoJSON' if '"Topology"' in f.read(4096) else 'GeoJSON'
+
+# Function to pick the cheapest LAU file that fits the budget together
+# with the other files, the traced ones being loaded while tracemalloc
+# runs. It returns the path of the LAU file, raises FileNotFoundError
+# if none of the LAU files exists or MemoryBudgetError if none fits
+def plan(budget, lau_paths, other_paths=(), traced_paths=()):
+    others = (BASE_MEMORY + sum(estimate(path, kind) for path, kind in other_paths)
+              + sum(estimate(path, kind, traced=True) for path, kind in traced_paths))
+    candidates = [(estimate(path, lau_kind(path)), path) for path in lau_paths if os.path.exists(path)]
+    if not candidates:
+        raise FileNotFoundError(f'None of the LAU files exists: {", ".join(map(str, lau_paths))}')
+    needed, path = min(candidates)
+    if needed + others > budget:
+        raise MemoryBudgetError(f'Memory budget of {format_size(budget)} cannot be met: '
+                                f'{path} needs about {format_size(needed + others)} '
+                                f'({format_size(needed)} for the LAUs)')
+    print(f'   Memory: {path} ({lau_kind(path)}), about {format_size(needed + others)} '
+          f'of {format_size(budget)}')
+    return path
+
+
+class MemoryTracker:
+
+    def __init__(self, budget=None, top=TOP_ALLOCATIONS):
+        self.budget = budget
+        self.top = top
+        self.phases = []
+        self.phase = None
+
+    # Function to start a phase of the run, the allocations are traced
+    # from the first phase with trace set, the others only get the RSS
+    def start(self, name, trace=True):
+        if not self.budget:
+            return
+        self.phase = name
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        elif trace:
+            tracemalloc.start()
+
+    # Function to end a phase, print its peak memory
+    # and its top allocations and check the budget
+    def end(self):
+        if not self.budget:
+            return
+        rss = peak_rss()
+        if not tracemalloc.is_tracing():
+            self.phases.append((self.phase, rss, None))
+            print(f'   [{self.phase}] peak RSS {format_size(rss)}')
+            self.check()
+            return
+        current, traced = tracemalloc.get_traced_memory()
+        self.phases.append((self.phase, rss, traced))
+        print(f'   [{self.phase}] peak RSS {format_size(rss)}, peak traced {format_size(traced)}')
+        for stat in tracemalloc.take_snapshot().statistics('lineno')[:self.top]:
+            print(f'      {stat}')
+        self.check()
+
+    # Function to stop the run when the peak RSS is over the budget
+    def check(self):
+        if not self.budget:
+            return
+        rss = peak_rss()
+        if rss > self.budget:
+            raise MemoryBudgetError(f'Memory budget of {format_size(self.budget)} exceeded '
+                                    f'in the {self.phase} phase: peak RSS {format_size(rss)}')
+
+    # Function to print the summary of the phases
+    def report(self):
+        if not self.budget:
+            return
+        print('Memory:')
+        for name, rss, traced in self.phases:
+            if traced is None:
+                print(f'   {name}: peak RSS {format_size(rss)}')
+            else:
+                print(f'   {name}: peak RSS {format_size(rss)}, peak traced {format_size(traced)}')
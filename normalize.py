@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    normalize.py
+
+    Input normalization
+    Clean the 'Reference mountain landscape' and 'LAU' values of a row
+    of the value chain dataset before the LAU search
+
+    Run it as a script to time the stage on a dataset:
+    python normalize.py [dataset.csv]
+"""
+
+import re
+import csv
+import sys
+import time
+from functools import lru_cache
+
+# Size of the memo tables, rows repeat the same values a lot
+CACHE_SIZE = 65536
+
+# Clean the value in brackets, then the words 'LAU' or 'LAU1'
+RE_BRACKETS = re.compile(r'\s\(.*')
+RE_LANDSCAPE_LAU = re.compile(r'LAU\s?1\s')
+# Clean the words 'LAU' or 'LAU1', the prefix 'TR000-', the words
+# 'NUTS 3' or 'NUTS3' and the text after a five digits code
+RE_LAU_CODE = re.compile(r'LAU\s?1\s?|TR\d\d\d-|NUTS\s?3\s|(?<=\d{5})\s.*$')
+# Multiple lau codes (e.g. '7405 and 7406')
+RE_MULTIPLE = re.compile(r'\d* and \d*')
+RE_CODES = re.compile(r'\d\d+')
+# Country code at the end of the value chain id (e.g. VC_01_AT)
+RE_CTR_CODE = re.compile(r'(?<=_)\w\w\w?\d?\s*?$')
+
+NOT_USED = "LAU 1 not used"
+
+
+# Function to get the country codes from the value chain id
+@lru_cache(maxsize=CACHE_SIZE)
+def ctr_code_from_vc_id(vc_id):
+    w = RE_CTR_CODE.findall(vc_id)
+    if w[0][:2]=="GR":
+        return ("EL",)
+    elif w[0][:2]=="SE":
+        return ("RS",)
+    elif w[0]=="SCA":
+        return ("NO","FI")
+    else:
+        return (w[0][:2],)
+
+# Function to clean the mountain landscape value
+def clean_landscape(mountain_landscape):
+    m_l = RE_BRACKETS.sub('', mountain_landscape)
+    return RE_LANDSCAPE_LAU.sub('', m_l).strip()
+
+# Function to clean the value chain lau code value
+def clean_lau_code(vc_lau_code):
+    VC_l_c = RE_LAU_CODE.sub('', vc_lau_code)
+
+    # Uniformate multiple lau code in a list
+    if RE_MULTIPLE.match(VC_l_c):
+        VC_l_c = "".join(code + ";" for code in RE_CODES.findall(VC_l_c))
+    return VC_l_c
+
+# Function to get the district name when LAU 1 is not used
+# (e.g. 'LAU 1 not used in Austria – Scale therefore is „District“')
+def district_name(vc_lau_code):
+    start_index = vc_lau_code.find("„") + 1
+    end_index = vc_lau_code.find("“", start_index)
+    if start_index == 0 or end_index == -1:
+        return ""
+    return vc_lau_code[start_index:end_index]
+
+# Function to normalize the values of a row, it returns the
+# cleaned mountain landscape, the cleaned lau code and the
+# country codes of the value chain
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_row(mountain_landscape, vc_lau_code, vc_id):
+    ctr_code = ctr_code_from_vc_id(vc_id)
+    m_l = clean_landscape(mountain_landscape)
+    VC_l_c = clean_lau_code(vc_lau_code)
+
+    if NOT_USED in vc_lau_code:
+        value = district_name(vc_lau_code)
+        if value:
+            m_l = m_l + " " + value
+
+    # Corsica is an italian word, Translate the word in French
+    if(m_l=="Corsica"):
+        m_l="Corse"
+
+    # Fix LAU code of some nation
+    if 'IT' in ctr_code:
+        if len(VC_l_c)==4:
+            VC_l_c = '00'+VC_l_c
+        if len(VC_l_c)==5:
+            VC_l_c = '0'+VC_l_c
+    elif 'PT' in ctr_code:
+        VC_l_c = '0'+VC_l_c
+
+    return m_l.lower(), VC_l_c, ctr_code
+
+
+if __name__ == '__main__':
+    dataset = sys.argv[1] if len(sys.argv) > 1 else 'vc_1.csv'
+    with open(dataset, encoding='utf-8') as f:
+        rows = [(row[4], row[5], row[1]) for row in csv.reader(f, delimiter=',')]
+
+    # First pass fills the memo tables, second pass only hits them
+    start = time.perf_counter()
+    for row in rows:
+        normalize_row(*row)
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for row in rows:
+        normalize_row(*row)
+    warm = time.perf_counter() - start
+
+    print(f'Rows: {len(rows)}')
+    print(f'First pass: {cold * 1e6 / len(rows):.2f} us/row')
+    print(f'Second pass: {warm * 1e6 / len(rows):.2f} us/row')
+    print(normalize_row.cache_info())
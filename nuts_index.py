@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    nuts_index.py
+
+    NUTS hierarchy index
+    Link each LAU to its NUTS3 and each NUTS3 to its NUTS2, NUTS1
+    and country, so that parent lookups, "all LAUs under NUTS X"
+    queries and the search by NUTS code or name are dict lookups
+    instead of scans of the GeoJSON features. The LAUs under every
+    NUTS are only indexed the first time they are asked for.
+"""
+
+import re
+from collections import defaultdict
+from shapely.geometry import shape
+
+# A NUTS code, from the country to the NUTS3 (e.g. AT, AT3, AT31, AT314)
+RE_NUTS_ID = re.compile(r'[A-Z]{2}[0-9A-Z]{0,3}')
+
+
+# Function to check if a value is a NUTS code
+def is_nuts_id(value):
+    return RE_NUTS_ID.fullmatch(value) is not None
+
+# Function to get the parent of a NUTS code,
+# e.g. ITC11 -> ITC1 -> ITC -> IT
+def nuts_parent(nuts_id):
+    if len(nuts_id) > 2:
+        return nuts_id[:-1]
+    return None
+
+# Function to get the name of a NUTS feature used in the search,
+# the latin name if the feature has one, the NUTS name otherwise
+def nuts_name(properties):
+    try:
+        return properties['NAME_LATIN'].lower()
+    except (KeyError, AttributeError):
+        return properties['NUTS_NAME'].lower()
+
+
+class NutsIndex:
+
+    def __init__(self, nuts_features, lau_list=()):
+        # NUTS_ID -> feature and position of the feature in the file
+        self.features = {}
+        self.position = {}
+        # Lowercase name -> NUTS_ID of the first feature with that name
+        self.names = {}
+        # NUTS_ID (any level) -> (CNTR_CODE, LAU code) of the LAUs
+        # under it, built at the first query
+        self._laus = None
+        # Lowercase LAU name or latin name -> positions in the LAU list
+        self.lau_names = defaultdict(list)
+        self.lau_list = lau_list
+        # Geometries are built only when they are asked for
+        self._shapes = {}
+
+        self.add(nuts_features)
+
+        for i, lau_dict in enumerate(lau_list):
+            names = {lau_dict['name'].lower(), lau_dict['nameLat'].lower()}
+            for name in names:
+                self.lau_names[name].append(i)
+
+    # Function to add the NUTS features to the index,
+    # the NUTS can be added after the LAU list
+    def add(self, nuts_features):
+        start = len(self.position)
+        for i, feature in enumerate(nuts_features, start):
+            nuts_id = feature['properties']['NUTS_ID']
+            if nuts_id in self.features:
+                continue
+            self.features[nuts_id] = feature
+            self.position[nuts_id] = i
+            self.names.setdefault(nuts_name(feature['properties']), nuts_id)
+
+    # Function to get the NUTS feature of a code
+    def feature(self, nuts_id):
+        return self.features.get(nuts_id)
+
+    # Function to get the parent NUTS code
+    def parent(self, nuts_id):
+        parent = nuts_parent(nuts_id)
+        return parent if parent in self.features else None
+
+    # Function to get the NUTS2, NUTS1 and country codes above a NUTS code
+    def ancestors(self, nuts_id):
+        ancestors = []
+        nuts_id = self.parent(nuts_id)
+        while nuts_id:
+            ancestors.append(nuts_id)
+            nuts_id = self.parent(nuts_id)
+        return ancestors
+
+    # Function to get the country of a NUTS code
+    def country(self, nuts_id):
+        feature = self.features.get(nuts_id)
+        if feature:
+            return feature['properties']['CNTR_CODE']
+        return nuts_id[:2]
+
+    # Function to get all the LAUs under a NUTS code
+    def laus_under(self, nuts_id):
+        if self._laus is None:
+            self._laus = defaultdict(list)
+            for lau_dict in self.lau_list:
+                nuts3 = lau_dict['nuts3']
+                key = (nuts3[:2], lau_dict['lauCode'])
+                # Register the LAU under the NUTS3 and all its ancestors
+                code = nuts3
+                while code:
+                    self._laus[code].append(key)
+                    code = nuts_parent(code)
+        return self._laus.get(nuts_id, [])
+
+    # Function to search a LAU by name in the LAU list,
+    # it returns the first LAU of one of the countries
+    def find_lau(self, name, ctr_code):
+        for i in self.lau_names.get(name, []):
+            lau_dict = self.lau_list[i]
+            if lau_dict['nuts3'][:2] in ctr_code:
+                return lau_dict
+        return None
+
+    # Function to search a NUTS by code or by name, as in a scan of
+    # the features the first feature that matches one of them is returned
+    def find(self, nuts_id, name):
+        found = [n for n in (nuts_id, self.names.get(name)) if n in self.features]
+        if found:
+            return min(found, key=self.position.get)
+        return None
+
+    # Function to get the shape of a NUTS, built once
+    def shape(self, nuts_id):
+        if nuts_id not in self._shapes:
+            self._shapes[nuts_id] = shape(self.features[nuts_id]['geometry'])
+        return self._shapes[nuts_id]
+
+    # Function to drop the geometries built so far
+    def clear(self):
+        self._shapes.clear()
+
+    # Function to drop the NUTS features, the index of the
+    # LAU list is kept and the NUTS can be added again
+    def unload(self):
+        self.features.clear()
+        self.position.clear()
+        self.names.clear()
+        self.clear()
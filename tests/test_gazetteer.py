@@ -0,0 +1,74 @@
+import json
+
+from lau_store import load_lau
+from nuts_index import NutsIndex
+from vintages import LAUVintages, NUTSVintages
+from gazetteer import Gazetteer, gazetteer_key, resolve, VERSION
+
+
+def square(x, y):
+    return [[[x, y], [x + 1, y], [x + 1, y + 1], [x, y + 1], [x, y]]]
+
+
+def vintages(tmp_path):
+    features = [{'type': 'Feature',
+                 'properties': {'CNTR_CODE': 'CH', 'LAU_ID': lau_id, 'LAU_NAME': lau_id},
+                 'geometry': {'type': 'Polygon', 'coordinates': square(x, 0)}}
+                for x, lau_id in enumerate(['1001', '1002', '1003'])]
+    path = tmp_path / 'lau_2020.geojson'
+    path.write_text(json.dumps({'type': 'FeatureCollection', 'features': features}))
+    lau_years = LAUVintages(2020, load_lau(path), years=(2020,), files=(), correspondence=tmp_path / 'none.csv')
+    nuts = NutsIndex([{'type': 'Feature',
+                       'properties': {'NUTS_ID': 'CH01', 'CNTR_CODE': 'CH', 'NUTS_NAME': 'Genève'},
+                       'geometry': {'type': 'Polygon', 'coordinates': square(0, 0)}}])
+    nuts_years = NUTSVintages(2021, nuts, years=(2021,), files=())
+    return lau_years, nuts_years
+
+
+def test_save_and_load(tmp_path):
+    gazetteer = Gazetteer()
+    key = gazetteer_key('sion ', '1002', ('CH',))
+    gazetteer.add(key, 'CH', '1002', 'lau_code', 2020)
+    gazetteer.add('CH|x|', '', '', 'wikidata', None, 'Point(7.36 46.23)')
+    gazetteer.save(tmp_path / 'gazetteer.json')
+
+    loaded = Gazetteer.load(tmp_path / 'gazetteer.json')
+    assert key == 'CH|sion|1002'
+    assert loaded.get(key) == ['CH', '1002', 'lau_code', 2020]
+    assert loaded.get('CH|x|') == ['', '', 'wikidata', None, 'Point(7.36 46.23)']
+    assert len(loaded) == 2
+
+
+def test_other_version_is_not_used(tmp_path):
+    path = tmp_path / 'gazetteer.json'
+    path.write_text(json.dumps({'version': VERSION + 1, 'entries': {'CH|sion|1002': ['CH', '1002', 'lau_code', 2020]}}))
+    assert len(Gazetteer.load(path)) == 0
+    assert len(Gazetteer.load(tmp_path / 'missing.json')) == 0
+
+
+def test_entries_without_code_are_skipped():
+    gazetteer = Gazetteer()
+    gazetteer.add('CH|a|', '', '', 'lau_prefix', 2020)
+    gazetteer.add('CH|b|', 'CH', '', 'lau_multi', 2020)
+    assert len(gazetteer) == 0
+
+
+def test_resolve_lau_multi(tmp_path):
+    lau_years, nuts_years = vintages(tmp_path)
+    result = resolve(['CH;CH;', '1001;1002;', 'lau_multi', 2020], lau_years, nuts_years)
+    cntr_code, code, centroid, union = result
+    assert (cntr_code, code) == ('CH;CH;', '1001;1002;')
+    assert union.bounds == (0, 0, 2, 1)
+    assert (centroid.x, centroid.y) == (1, 0.5)
+
+
+def test_resolve_lau_and_nuts(tmp_path):
+    lau_years, nuts_years = vintages(tmp_path)
+    loads = []
+    assert resolve(['CH', '1003', 'lau_code', 2020], lau_years, nuts_years)[3].bounds == (2, 0, 3, 1)
+    assert resolve(['CH', 'CH01', 'nuts', 2021], lau_years, nuts_years, lambda: loads.append(1))[1] == 'CH01'
+    assert loads == [1]
+    # Codes that are not in the GISCO files
+    assert resolve(['CH;CH;', '1001;9999;', 'lau_multi', 2020], lau_years, nuts_years) is None
+    assert resolve(['CH', 'CH02', 'nuts', 2021], lau_years, nuts_years) is None
+    assert resolve(['CH', '1001', 'lau_year', 2015], lau_years, nuts_years) is None
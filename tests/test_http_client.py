@@ -0,0 +1,79 @@
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from http_client import HttpClient, CircuitOpenError
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        body = b'{"ok": true}' if status == 200 else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    # Status codes of the next replies, 200 once they are used up
+    server.statuses = []
+    server.hits = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def url(server, path='/query'):
+    return f'http://127.0.0.1:{server.server_port}{path}'
+
+
+def test_5xx_replies_are_retried(stub):
+    client = HttpClient(timeouts={}, retries=2, backoff=0.01)
+    stub.statuses = [503, 502]
+    response = client.get(url(stub))
+    assert response.json() == {'ok': True}
+    assert len(stub.hits) == 3
+
+
+def test_breaker_opens_after_threshold_failures(stub):
+    client = HttpClient(timeouts={}, retries=1, backoff=0.01, threshold=2, cooldown=60)
+    stub.statuses = [500] * 4
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            client.get(url(stub))
+    assert len(stub.hits) == 4
+
+    # The endpoint is not called any more
+    with pytest.raises(CircuitOpenError):
+        client.get(url(stub))
+    assert len(stub.hits) == 4
+
+
+def test_breaker_closes_after_cooldown(stub):
+    client = HttpClient(timeouts={}, retries=0, backoff=0.01, threshold=1, cooldown=0.2)
+    stub.statuses = [500]
+    with pytest.raises(requests.HTTPError):
+        client.get(url(stub))
+    with pytest.raises(CircuitOpenError):
+        client.get(url(stub))
+
+    time.sleep(0.3)
+    assert client.get(url(stub)).status_code == 200
+    # Closed again: the next calls reach the endpoint
+    assert client.get(url(stub)).status_code == 200
+    assert len(stub.hits) == 3
@@ -0,0 +1,161 @@
+import csv
+import json
+from pathlib import Path
+
+import pytest
+from shapely.ops import unary_union
+
+import lau_store
+from normalize import normalize_row
+from lau_store import is_lau_id, load_lau, GeoJSONLAU, TopoJSONLAU
+
+DATASET = Path(__file__).resolve().parent.parent / 'vc_1.csv'
+
+# Some of the NUTS 2021 codes of Bulgaria
+BG_NUTS = {'BG', 'BG3', 'BG31', 'BG311', 'BG34', 'BG341', 'BG4', 'BG41', 'BG411', 'BG42', 'BG425'}
+
+
+def bulgarian_codes():
+    with open(DATASET, encoding='utf-8') as f:
+        rows = [normalize_row(row[4], row[5], row[1]) for row in csv.reader(f, delimiter=',')
+                if row[1].strip().endswith('_BG')]
+    return [(VC_l_c, ctr_code) for m_l, VC_l_c, ctr_code in rows]
+
+
+def test_bulgarian_codes_are_lau_codes():
+    codes = bulgarian_codes()
+    assert len(codes) == 20
+    assert {'GAB05', 'BGS13', 'SOF46', 'MON02', 'SML31'} <= {code for code, _ in codes}
+    for code, ctr_code in codes:
+        assert is_lau_id(code, ctr_code, BG_NUTS), code
+
+
+def test_lau_id():
+    assert is_lau_id('001001', ('IT',))
+    assert is_lau_id('GAB05', ('BG',))
+    assert not is_lau_id('BG311', ('BG',), BG_NUTS)
+    # Without the NUTS codes, a NUTS-like code of the row's country
+    assert not is_lau_id('AT22', ('AT',))
+    assert not is_lau_id('CZ0322', ('CZ',))
+    for value in ('', 'N/A', '61701 Weiz', '001;002'):
+        assert not is_lau_id(value, ('AT',))
+
+
+# Scale and translation of the quantized topologies
+TRANSFORM = {'scale': [0.5, 0.25], 'translate': [10, 40]}
+
+
+# Function to square a cell of the grid, counterclockwise
+def cell(x, y):
+    return [(x, y), (x + 1, y), (x + 1, y + 1), (x, y + 1), (x, y)]
+
+
+# Function to write a topology with one LAU for every list of rings,
+# every edge of the grid is an arc, shared by the LAUs on its two sides
+def write_topology(path, laus, transform=TRANSFORM):
+    arcs = {}
+    def ref(p, q):
+        if (q, p) in arcs:
+            return ~arcs[(q, p)]
+        return arcs.setdefault((p, q), len(arcs))
+
+    geometries = []
+    for i, rings in enumerate(laus):
+        refs = [[ref(p, q) for p, q in zip(ring, ring[1:])] for ring in rings]
+        geometries.append({'type': 'Polygon', 'arcs': refs,
+                           'properties': {'CNTR_CODE': 'IT', 'LAU_ID': f'{i:03d}', 'LAU_NAME': f'LAU {i}'}})
+    if transform:
+        # Quantized arcs are delta-encoded
+        encoded = [[list(p), [q[0] - p[0], q[1] - p[1]]] for p, q in arcs]
+    else:
+        encoded = [[[x * 0.5 + 10, y * 0.25 + 40] for x, y in arc] for arc in arcs]
+    topology = {'type': 'Topology', 'arcs': encoded,
+                'objects': {'lau': {'type': 'GeometryCollection', 'geometries': geometries}}}
+    if transform:
+        topology['transform'] = transform
+    path.write_text(json.dumps(topology))
+    return TopoJSONLAU(path)
+
+
+# Function to fail if the union falls back to unary_union
+@pytest.fixture
+def no_fallback(monkeypatch):
+    def fail(geometries):
+        raise AssertionError('unary_union fallback')
+    monkeypatch.setattr(lau_store, 'unary_union', fail)
+
+
+def expected(laus, indices):
+    return unary_union([laus.shape(i) for i in indices])
+
+
+@pytest.mark.parametrize('transform', [TRANSFORM, None])
+def test_shape_decodes_the_arcs(tmp_path, transform):
+    laus = write_topology(tmp_path / 'lau.json', [[cell(0, 0)], [cell(1, 0)]], transform)
+    assert laus.shape(1).bounds == (10.5, 40, 11, 40.25)
+    assert laus.shape(0).area == 0.5 * 0.25
+
+
+def test_union_of_adjacent_laus(tmp_path, no_fallback):
+    laus = write_topology(tmp_path / 'lau.json', [[cell(0, 0)], [cell(1, 0)], [cell(1, 1)]])
+    union = laus.union([0, 1, 2])
+    assert union.geom_type == 'Polygon'
+    assert union.equals(expected(laus, [0, 1, 2]))
+    assert len(union.exterior.coords) == 9
+
+
+def test_union_around_an_enclave(tmp_path, no_fallback):
+    ring = [[cell(x, y)] for x in range(3) for y in range(3) if (x, y) != (1, 1)]
+    laus = write_topology(tmp_path / 'lau.json', ring + [[cell(1, 1)]])
+    union = laus.union(range(8))
+    assert len(union.interiors) == 1
+    assert union.equals(expected(laus, range(8)))
+    # With the enclave the union has no hole
+    assert laus.union(range(9)).equals(expected(laus, range(9)))
+    assert len(laus.union(range(9)).interiors) == 0
+
+
+def test_union_of_a_lau_with_a_hole(tmp_path, no_fallback):
+    # The arcs are split where the LAUs meet, as in the GISCO topologies
+    square = ([(x, 0) for x in range(3)] + [(3, y) for y in range(3)]
+              + [(x, 3) for x in range(3, 0, -1)] + [(0, y) for y in range(3, -1, -1)])
+    hole = [(1, 1), (1, 2), (2, 2), (2, 1), (1, 1)]
+    laus = write_topology(tmp_path / 'lau.json', [[square, hole], [cell(3, 0)]])
+    union = laus.union([0, 1])
+    assert len(union.interiors) == 1
+    assert union.equals(expected(laus, [0, 1]))
+
+
+def test_union_of_laus_touching_at_a_corner(tmp_path):
+    laus = write_topology(tmp_path / 'lau.json', [[cell(0, 0)], [cell(1, 1)]])
+    union = laus.union([0, 1])
+    assert union.is_valid
+    assert union.equals(expected(laus, [0, 1]))
+
+
+def test_union_that_cannot_be_stitched(tmp_path, monkeypatch):
+    # The second LAU overlaps the first one: the arcs they both use in
+    # the same direction are dropped and the border cannot be closed
+    rectangle = [(0, 0), (1, 0), (2, 0), (2, 1), (1, 1), (0, 1), (0, 0)]
+    laus = write_topology(tmp_path / 'lau.json', [[cell(0, 0)], [rectangle]])
+    def fail(rings):
+        raise AssertionError('stitched')
+    monkeypatch.setattr(TopoJSONLAU, '_assemble', staticmethod(fail))
+    assert laus.union([0, 1]).equals(laus.shape(1))
+
+
+def test_empty_union(tmp_path):
+    laus = write_topology(tmp_path / 'lau.json', [[cell(0, 0)]])
+    assert laus.union([]).is_empty
+
+
+def test_load_lau_detects_the_format(tmp_path):
+    write_topology(tmp_path / 'lau.json', [[cell(0, 0)]])
+    assert isinstance(load_lau(tmp_path / 'lau.json'), TopoJSONLAU)
+    geojson = {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'properties': {'CNTR_CODE': 'IT', 'LAU_ID': '000', 'LAU_NAME': 'LAU 0'},
+         'geometry': {'type': 'Polygon', 'coordinates': [cell(0, 0)]}}]}
+    (tmp_path / 'lau.geojson').write_text(json.dumps(geojson))
+    laus = load_lau(tmp_path / 'lau.geojson')
+    assert isinstance(laus, GeoJSONLAU)
+    assert laus.find(('IT',), '000') == 0
@@ -0,0 +1,33 @@
+import pytest
+
+from memory import plan, parse_size, largest, MemoryBudgetError, BASE_MEMORY
+
+
+def test_parse_size():
+    assert parse_size('512M') == 512 * 2**20
+    assert parse_size('1.5GB') == int(1.5 * 2**30)
+
+
+def test_traced_files_count_the_traces(tmp_path):
+    lau = tmp_path / 'lau.geojson'
+    lau.write_text(' ' * 2**20)
+    nuts = tmp_path / 'nuts.geojson'
+    nuts.write_text(' ' * 2**20)
+    # 4 MB for the LAUs and 4 MB for the NUTS when they are not traced
+    assert plan(BASE_MEMORY + 8 * 2**20, [str(lau)], [(str(nuts), 'GeoJSON')]) == str(lau)
+    with pytest.raises(MemoryBudgetError):
+        plan(BASE_MEMORY + 8 * 2**20, [str(lau)], traced_paths=[(str(nuts), 'GeoJSON')])
+
+
+def test_missing_lau_file_is_an_error(tmp_path):
+    with pytest.raises(FileNotFoundError, match='missing.json'):
+        plan(2**30, [str(tmp_path / 'missing.json')])
+
+
+def test_largest(tmp_path):
+    small = tmp_path / 'small.json'
+    small.write_text('{}')
+    big = tmp_path / 'big.json'
+    big.write_text('{"a": 1}')
+    assert largest([str(small), str(big)]) == str(big)
+    assert largest([]) is None
@@ -0,0 +1,93 @@
+import re
+import csv
+from pathlib import Path
+
+import pytest
+
+from normalize import normalize_row, ctr_code_from_vc_id
+
+DATASET = Path(__file__).resolve().parent.parent / 'vc_1.csv'
+
+
+# The cleaning of app.py before the normalize stage
+def baseline(mountain_landscape, vc_lau_code, vc_id):
+    w = re.findall(r'(?<=_)\w\w\w?\d?\s*?$', vc_id)
+    if w[0][:2]=="GR":
+        ctr_code = ["EL"]
+    elif w[0][:2]=="SE":
+        ctr_code = ["RS"]
+    elif w[0]=="SCA":
+        ctr_code = ["NO","FI"]
+    else:
+        ctr_code = [w[0][:2]]
+
+    m_l=re.sub(r'\s(\(.*)', '', mountain_landscape)
+    m_l=re.sub(r'LAU\s?1\s', '', m_l)
+    m_l=m_l.strip()
+
+    VC_l_c=re.sub(r'LAU\s?1\s?', '', vc_lau_code)
+    VC_l_c=re.sub(r'TR\d\d\d-', '', VC_l_c)
+    VC_l_c=re.sub(r'NUTS\s?3\s', '', VC_l_c)
+    VC_l_c=re.sub(r'(?<=\d{5})\s.*$', '', VC_l_c)
+
+    if "LAU 1 not used" in vc_lau_code:
+        try:
+            start_index = vc_lau_code.index("„") + 1
+            end_index = vc_lau_code.index("“", start_index)
+            m_l = m_l + " " + vc_lau_code[start_index:end_index]
+        except ValueError:
+            pass
+
+    if re.match(r"\d* and \d*", VC_l_c):
+        VC_l_c="".join(i + ";" for i in re.findall(r'\d\d+', VC_l_c))
+
+    if(m_l=="Corsica"):
+        m_l="Corse"
+
+    if 'IT' in ctr_code:
+        if len(VC_l_c)==4:
+            VC_l_c = '00'+VC_l_c
+        if len(VC_l_c)==5:
+            VC_l_c = '0'+VC_l_c
+    elif 'PT' in ctr_code:
+        VC_l_c = '0'+VC_l_c
+
+    return m_l.lower(), VC_l_c, tuple(ctr_code)
+
+
+def dataset_rows():
+    with open(DATASET, encoding='utf-8') as f:
+        return [(row[4], row[5], row[1]) for row in csv.reader(f, delimiter=',')]
+
+
+def test_dataset_matches_baseline():
+    for row in dataset_rows():
+        assert normalize_row(*row) == baseline(*row)
+
+
+@pytest.mark.parametrize('row', [
+    ("Foo LAU 1 (x)", "N/A", "VC_01_AT"),
+    ("LAU1 Trutnov (district)", "LAU 1 CZ0525", "VC_10_CZ"),
+    ("Corsica", "N/A", "VC_04_FR"),
+    ("Sambuca Pistoiese ", "7044", "VC_26_IT"),
+    ("Manteigas", "908", "VC_18_PT2"),
+    ("Kissamos", "7405 and 7406", "VC_10_GR"),
+    ("Balkan mountains", "70939 Pirot", " VC_10_SER"),
+    ("Bergama", "TR310-1181", "VC_17_TR"),
+    ("Weiz (No: 617)", "LAU 1 not used in Austria – Scale therefore is „District“", "VC_01_AT"),
+    ("Weiz", "LAU 1 not used in Austria", "VC_02_AT"),
+    ("Lesja", "NUTS 3 12345 x", "VC_08_SCA"),
+])
+def test_edge_cases_match_baseline(row):
+    assert normalize_row(*row) == baseline(*row)
+
+
+def test_lau_before_brackets():
+    assert normalize_row("Foo LAU 1 (x)", "N/A", "VC_01_AT")[0] == "foo lau 1"
+
+
+def test_ctr_code():
+    assert ctr_code_from_vc_id("VC_10_GR") == ("EL",)
+    assert ctr_code_from_vc_id("VC_10_SER") == ("RS",)
+    assert ctr_code_from_vc_id("VC_08_SCA") == ("NO", "FI")
+    assert ctr_code_from_vc_id("VC_18_PT2") == ("PT",)
@@ -0,0 +1,36 @@
+from nuts_index import NutsIndex
+
+
+def nuts(nuts_id, name):
+    return {'type': 'Feature',
+            'properties': {'NUTS_ID': nuts_id, 'CNTR_CODE': nuts_id[:2], 'NUTS_NAME': name},
+            'geometry': {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 0]]]}}
+
+
+FEATURES = [nuts('AT', 'Österreich'), nuts('AT2', 'Südösterreich'), nuts('AT22', 'Steiermark')]
+LAU_LIST = [{'nuts3': 'AT224', 'lauCode': '61701', 'name': 'Weiz', 'nameLat': 'Weiz'}]
+
+
+def test_unload_keeps_the_lau_list():
+    index = NutsIndex(FEATURES, LAU_LIST)
+    assert index.find('AT22', '') == 'AT22'
+    index.shape('AT22')
+
+    index.unload()
+    assert not index.features and not index.names and not index._shapes
+    assert index.find('AT22', 'steiermark') is None
+    assert index.find_lau('weiz', ('AT',))['lauCode'] == '61701'
+    assert index.laus_under('AT2') == [('AT', '61701')]
+
+    index.add(FEATURES)
+    assert index.find('', 'steiermark') == 'AT22'
+    assert index.ancestors('AT22') == ['AT2', 'AT']
+
+
+def test_laus_under_is_built_on_demand():
+    index = NutsIndex([], LAU_LIST + [{'nuts3': 'AT225', 'lauCode': '62001', 'name': 'Gröbming', 'nameLat': 'Gröbming'}])
+    assert index._laus is None
+    assert index.laus_under('AT224') == [('AT', '61701')]
+    assert index.laus_under('AT22') == [('AT', '61701'), ('AT', '62001')]
+    assert index.laus_under('AT') == [('AT', '61701'), ('AT', '62001')]
+    assert index.laus_under('IT') == []
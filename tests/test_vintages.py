@@ -0,0 +1,89 @@
+import json
+
+from lau_store import load_lau
+from vintages import LAUVintages, NUTSVintages, load_nuts
+
+
+def write_laus(path, laus):
+    features = [{'type': 'Feature',
+                 'properties': {'CNTR_CODE': cntr, 'LAU_ID': lau_id, 'LAU_NAME': lau_id},
+                 'geometry': {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 0]]]}}
+                for cntr, lau_id in laus]
+    path.write_text(json.dumps({'type': 'FeatureCollection', 'features': features}))
+
+
+def vintages(tmp_path, keep):
+    write_laus(tmp_path / 'lau_2020.geojson', [('IT', '001001')])
+    write_laus(tmp_path / 'lau_2019.geojson', [('IT', '001002')])
+    write_laus(tmp_path / 'lau_2018.geojson', [('IT', '001003')])
+    primary = load_lau(tmp_path / 'lau_2020.geojson')
+    years = LAUVintages(2020, primary, years=range(2018, 2021), files=(str(tmp_path / 'lau_{year}.geojson'),),
+                        correspondence=tmp_path / 'none.csv', keep=keep)
+    loads = []
+    def load(path):
+        loads.append(path)
+        return load_lau(path)
+    years.load = load
+    return years, loads
+
+
+def test_missing_code_loads_every_year_once(tmp_path):
+    years, loads = vintages(tmp_path, keep=1)
+    for _ in range(3):
+        assert years.find(('IT',), '999999') is None
+    assert len(loads) == 2
+
+
+def test_year_is_loaded_again_only_for_its_codes(tmp_path):
+    years, loads = vintages(tmp_path, keep=1)
+    year, store, k = years.find(('IT',), '001003')
+    assert (year, store.properties[k]['LAU_ID']) == (2018, '001003')
+    year, store, k = years.find(('IT',), '001002')
+    assert year == 2019
+    assert years.loaded() == [2020, 2019]
+    # 2018 is dropped but not loaded again for a code it does not have
+    assert years.find(('IT',), '999999') is None
+    assert years.find(('FR',), '001003') is None
+    assert len(loads) == 3
+
+
+def test_missing_code_keeps_no_year_loaded(tmp_path):
+    years, loads = vintages(tmp_path, keep=None)
+    assert years.find(('IT',), '999999') is None
+    assert years.loaded() == [2020]
+    assert len(loads) == 2
+    # Only the year with the code is loaded again
+    assert years.find(('IT',), '001002')[0] == 2019
+    assert years.loaded() == [2020, 2019]
+    assert len(loads) == 3
+
+
+def write_nuts(path, nuts_ids):
+    features = [{'type': 'Feature',
+                 'properties': {'NUTS_ID': nuts_id, 'CNTR_CODE': nuts_id[:2], 'NUTS_NAME': nuts_id},
+                 'geometry': {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 0]]]}}
+                for nuts_id in nuts_ids]
+    path.write_text(json.dumps({'type': 'FeatureCollection', 'features': features}))
+
+
+def test_missing_nuts_loads_every_version_once(tmp_path):
+    write_nuts(tmp_path / 'nuts_2021.geojson', ['BG', 'BG3'])
+    write_nuts(tmp_path / 'nuts_2016.geojson', ['BG', 'BG3', 'BG31'])
+    write_nuts(tmp_path / 'nuts_2013.geojson', ['BG', 'BG3', 'BG32'])
+    primary = load_nuts(tmp_path / 'nuts_2021.geojson')
+    years = NUTSVintages(2021, primary, years=(2013, 2016, 2021),
+                         files=(str(tmp_path / 'nuts_{year}.geojson'),), keep=1)
+    loads = []
+    def load(path):
+        loads.append(path)
+        return load_nuts(path)
+    years.load = load
+
+    for _ in range(5):
+        assert years.find('GAB05') is None
+    assert len(loads) == 2
+    # A version is loaded again only for a code it has
+    assert years.find('BG32')[0] == 2013
+    assert years.find('BG31')[0] == 2016
+    assert len(loads) == 4
+    assert years.loaded() == [2021, 2016]
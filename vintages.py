@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+    vintages.py
+
+    GISCO vintages
+    GISCO publishes the LAUs every year since 2011 and the NUTS at
+    every revision. The codes of the value chains do not all refer to
+    the same year, so a code that is not found in the primary year is
+    searched in the other years. Every year is loaded and indexed on
+    its own, only the first time a code misses in the primary year,
+    and only if its file is on disk. The codes of a year are indexed
+    when it is first searched and the year is kept loaded only if it
+    has the code: the index is kept, so a year is loaded again only
+    for a code it has.
+
+    The correspondence table is a CSV file with the header
+    CNTR_CODE,YEAR_FROM,CODE_FROM,YEAR_TO,CODE_TO
+    where every row tells that the code of a year was replaced by
+    another one in a later year. No table is shipped, it has to be
+    built from the GISCO/Eurostat LAU change lists.
+"""
+
+import os
+import csv
+import json
+from collections import defaultdict
+from lau_store import load_lau
+from nuts_index import NutsIndex
+
+# LAU years and NUTS versions published by GISCO
+LAU_YEARS = range(2011, 2024)
+NUTS_YEARS = (2010, 2013, 2016, 2021)
+# Files of every year, the TopoJSON is used when it exists
+LAU_FILES = ("topojson/LAU_RG_01M_{year}_4326.json", "geojson/LAU_RG_01M_{year}_4326.geojson")
+NUTS_FILES = ("geojson/NUTS_RG_20M_{year}_4326.geojson",)
+# Code correspondence between years
+CSV_CORRESPONDENCE = "lau_correspondence.csv"
+
+
+# Function to get the file of a year, None if there is no file
+def vintage_path(files, year):
+    for pattern in files:
+        path = pattern.format(year=year)
+        if os.path.exists(path):
+            return path
+    return None
+
+# Function to get the files of the years other than the primary one
+def vintage_paths(years, files, primary_year):
+    paths = (vintage_path(files, year) for year in years if year != primary_year)
+    return [path for path in paths if path]
+
+
+# Function to load the correspondence table,
+# (CNTR_CODE, CODE_FROM) -> list of (YEAR_FROM, YEAR_TO, CODE_TO)
+def load_correspondence(path=CSV_CORRESPONDENCE):
+    codes = defaultdict(list)
+    if not os.path.exists(path):
+        return codes
+    with open(path, encoding='utf-8') as f:
+        for row in csv.DictReader(f, delimiter=','):
+            codes[(row['CNTR_CODE'], row['CODE_FROM'])].append(
+                (int(row['YEAR_FROM']), int(row['YEAR_TO']), row['CODE_TO']))
+    return codes
+
+
+# Function to load and index the NUTS of a year
+def load_nuts(path):
+    with open(path) as g:
+        nuts = json.load(g)
+    return NutsIndex(nuts['features'])
+
+
+class Vintages:
+
+    def __init__(self, primary_year, primary, years, files, load, keep=None):
+        self.primary_year = primary_year
+        self.files = files
+        self.load = load
+        # Number of other years kept loaded, all of them if None
+        self.keep = keep
+        # Years with a file on disk, the nearest to the primary year first
+        self.years = sorted((year for year in years if year != primary_year and self.path(year)),
+                            key=lambda year: (abs(year - primary_year), -year))
+        # Year -> loaded data, the primary year is already loaded
+        self._loaded = {primary_year: primary}
+        # Year -> index of the codes, kept when the year is dropped
+        # so that a year is loaded again only when it has the code
+        self.ids = {}
+
+    # Function to get the file of a year, None if there is no file
+    def path(self, year):
+        return vintage_path(self.files, year)
+
+    # Function to drop the years loaded first so that
+    # one more can be loaded without keeping too many
+    def make_room(self):
+        others = [y for y in self._loaded if y != self.primary_year]
+        while self.keep is not None and others and len(others) >= self.keep:
+            del self._loaded[others.pop(0)]
+
+    # Function to load the data of a year, None if there is no file
+    def read(self, year):
+        path = self.path(year)
+        if path:
+            print(f'   Loading {path}')
+        return self.load(path) if path else None
+
+    # Function to get the data of a year, loaded the first time
+    def get(self, year):
+        if year not in self._loaded:
+            self.make_room()
+            self._loaded[year] = self.read(year)
+        return self._loaded[year]
+
+    # Function to drop the other years loaded so far
+    def unload(self):
+        self._loaded = {self.primary_year: self._loaded[self.primary_year]}
+
+    # Function to index the codes of the data of a year
+    def index(self, data):
+        raise NotImplementedError
+
+    # Function to check if a year has a code, match tells it from the
+    # index of the year. The first time the year is read to index its
+    # codes and it is kept loaded only if it has the code
+    def has(self, year, match):
+        if year not in self.ids:
+            loaded = year in self._loaded
+            if not loaded:
+                if not self.path(year):
+                    return False
+                self.make_room()
+            data = self._loaded[year] if loaded else self.read(year)
+            self.ids[year] = self.index(data)
+            if not loaded and match(self.ids[year]):
+                self._loaded[year] = data
+        return match(self.ids[year])
+
+    # Function to get the years loaded so far
+    def loaded(self):
+        return [year for year, data in self._loaded.items() if data is not None]
+
+
+class LAUVintages(Vintages):
+
+    def __init__(self, primary_year, primary, years=LAU_YEARS, files=LAU_FILES, correspondence=CSV_CORRESPONDENCE, keep=None):
+        super().__init__(primary_year, primary, years, files, load_lau, keep)
+        self.codes = load_correspondence(correspondence)
+
+    # Function to index the LAUs of a year, LAU_ID -> country codes
+    def index(self, store):
+        ids = defaultdict(set)
+        for props in store.properties:
+            ids[props['LAU_ID']].add(props['CNTR_CODE'])
+        return ids
+
+    # Function to check if a year has a LAU code in one of the countries
+    def has_lau(self, year, ctr_code, lau_id):
+        return self.has(year, lambda ids: any(c in ctr_code for c in ids.get(lau_id, ())))
+
+    # Function to follow the correspondence table from a code,
+    # it returns the (year, code) that replaced it, the nearest first.
+    # The year of the input code is not known, so any row of the code
+    # is followed first, then only the rows from the year reached
+    # onwards, so that the chain never goes back in time
+    def successors(self, ctr_code, lau_id):
+        seen = set()
+        queue = [(c, lau_id, None) for c in ctr_code]
+        found = []
+        while queue:
+            cntr, lau_id, since = queue.pop(0)
+            for year_from, year, code in self.codes.get((cntr, lau_id), []):
+                if since is not None and year_from < since:
+                    continue
+                if (cntr, year, code) not in seen:
+                    seen.add((cntr, year, code))
+                    found.append((year, code))
+                    queue.append((cntr, code, year))
+        return sorted(found, key=lambda item: abs(item[0] - self.primary_year))
+
+    # Function to search a LAU code that is not in the primary year,
+    # first through the correspondence table and then in the other years.
+    # It returns (year, store, position) or None
+    def find(self, ctr_code, lau_id):
+        if not lau_id:
+            return None
+        # The geometries of a year are loaded only when it has the code
+        for year, code in self.successors(ctr_code, lau_id):
+            if self.has_lau(year, ctr_code, code):
+                store = self.get(year)
+                return year, store, store.find(ctr_code, code)
+        for year in self.years:
+            if self.has_lau(year, ctr_code, lau_id):
+                store = self.get(year)
+                return year, store, store.find(ctr_code, lau_id)
+        return None
+
+
+class NUTSVintages(Vintages):
+
+    def __init__(self, primary_year, primary, years=NUTS_YEARS, files=NUTS_FILES, keep=None):
+        super().__init__(primary_year, primary, years, files, load_nuts, keep)
+
+    # Function to index the NUTS codes of a version
+    def index(self, nuts_index):
+        return set(nuts_index.features)
+
+    # Function to search a NUTS code that is not in the primary version.
+    # It returns (year, index) or None
+    def find(self, nuts_id):
+        if not nuts_id:
+            return None
+        # The NUTS of a version are loaded only when it has the code
+        for year in self.years:
+            if self.has(year, lambda ids: nuts_id in ids):
+                return year, self.get(year)
+        return None